@@ -1,24 +1,18 @@
 import sys
 from collections import deque
-from typing import Generic, TypeVar, Dict, List, Optional
+from typing import Collection, Generic, TypeVar, Dict, List, Optional, Tuple
 
 Variable = TypeVar('Variable')
 Domain = TypeVar('Domain')
 
 
-def print_sudoku(assignment: [Dict[str, str]]):
-    for row in range(1, 10):
-        if not row == 1 and (row - 1) % 3 == 0:
+def print_sudoku(assignment: Dict[int, int]):
+    # Each variable is the int col * 9 + row
+    for row in range(9):
+        if not row == 0 and row % 3 == 0:
             print("----------------------")
-        print(str(assignment.get('1' + str(row), ' ')) + " " +
-              str(assignment.get('2' + str(row), ' ')) + " " +
-              str(assignment.get('3' + str(row), ' ')) + " | " +
-              str(assignment.get('4' + str(row), ' ')) + " " +
-              str(assignment.get('5' + str(row), ' ')) + " " +
-              str(assignment.get('6' + str(row), ' ')) + " | " +
-              str(assignment.get('7' + str(row), ' ')) + " " +
-              str(assignment.get('8' + str(row), ' ')) + " " +
-              str(assignment.get('9' + str(row), ' ')))
+        print(" | ".join(" ".join(str(assignment.get(col * 9 + row, ' ')) for col in range(start, start + 3))
+                         for start in (0, 3, 6)))
     print()
 
 
@@ -28,14 +22,15 @@ class Constraint(Generic[Variable, Domain]):
     def __init__(self, variables: List[Variable]) -> None:
         # These variables will all share this constraint
         self.variables = variables
+        # A dictionary where a variable is a key to all the other variables in this constraint
+        # Built once here since the variables of a constraint never change
+        self.neighbors: Dict[Variable, Tuple[Variable, ...]] = {
+            variable: tuple(neighbor for neighbor in variables if neighbor != variable) for variable in variables
+        }
 
     # Gets all variables in this constraint that are not the provided variable
-    def get_neighbors(self, variable):
-        neighbors = []
-        for potential_neighbor in self.variables:
-            if potential_neighbor != variable:
-                neighbors.append(potential_neighbor)
-        return neighbors
+    def get_neighbors(self, variable: Variable) -> Tuple[Variable, ...]:
+        return self.neighbors[variable]
 
     # Abstract Method
     def is_satisfied(self, assignment: Dict[Variable, Domain]) -> bool:
@@ -43,11 +38,15 @@ class Constraint(Generic[Variable, Domain]):
 
 
 class ConstraintSatisfactionProblem(Generic[Variable, Domain]):
-    def __init__(self, variables: List[Variable], initial_domains: Dict[Variable, List[Domain]], initial_assignments: Dict[Variable, Domain] = {}, sudoku: bool = False):
-        # Enable infinite loop checking
-        self.loop_check = False
+    def __init__(self, variables: List[Variable], initial_domains: Dict[Variable, Collection[Domain]], initial_assignments: Dict[Variable, Domain] = {}, sudoku: bool = False, verbose: int = 0,
+                 value_order: Optional[List[Domain]] = None):
         # Enable sudoku-specific print statements
         self.sudoku = sudoku
+        # How much to print while solving: 0 is nothing but the result, 1 adds progress messages,
+        # and 2 adds printing the final sudoku board. Nothing is printed inside the search itself
+        # The "Success:" line from solve() is part of the result, since it is the double check of the solution,
+        # so it is printed at every level
+        self.verbose = verbose
         # Enable forward checking (mutually exclusive with ac3)
         self.forward = True
         # Enable ac3 (mututally exclusive with forward checking)
@@ -63,12 +62,33 @@ class ConstraintSatisfactionProblem(Generic[Variable, Domain]):
         self.variables = variables
         # Optional initial assignments (sudoku for example) is a dictionary where the key is a variable and the value is an assigned value (domain)
         self.initial_assignments = initial_assignments
-        # Non-optional initial domains is a dictionary where the key is a variable and the value is a list of values that make up its domain
+        # Non-optional initial domains is a dictionary where the key is a variable and the value is a collection of values that make up its domain
         self.initial_domains = initial_domains
+        # Optional order to try values in, as a dictionary where a value is a key to its rank in value_order
+        # A set domain iterates in hash order, which changes between runs for strings, so without this the search
+        # (and the solution it finds) would not be reproducible
+        self.value_rank: Optional[Dict[Domain, int]] = None
+        if value_order is not None:
+            self.value_rank = {value: rank for rank, value in enumerate(value_order)}
+            # Every value has to be ranked, otherwise sorting a domain during the search would fail
+            for variable, domain in initial_domains.items():
+                for value in domain:
+                    if value not in self.value_rank:
+                        raise ValueError("The value " + str(value) + " in the domain of " + str(variable) +
+                                         " is not in value_order")
         # A dictionary where a variable is a key to a list of constraints on that variable
         self.constraints: Dict[Variable, List[Constraint[Variable, Domain]]] = {}
-        # The list of all previous assignments used when loop_check is enabled
-        self.assignments_list = []
+        # A dictionary where a variable is a key to the set of every variable that shares a constraint with it
+        # Built by finalize() once all the constraints have been added
+        self.neighbors_of: Dict[Variable, frozenset] = {}
+        # A dictionary where an arc (variable, neighbor) is a key to the constraints the two variables share
+        # Built by finalize() once all the constraints have been added
+        self.shared_constraints: Dict[Tuple[Variable, Variable], List[Constraint[Variable, Domain]]] = {}
+        # The trail of every domain changed during the search, as (variable, old_domain)
+        # Popping entries off the trail restores the domains in-place when we backtrack, so they never need to be copied
+        self.trail: List[Tuple[Variable, Collection[Domain]]] = []
+        # A dictionary where a variable is a key to its degree, kept up to date as variables are assigned and unassigned
+        self.degree_cache: Dict[Variable, int] = {}
 
         # Create entries for each variable in the constraints dictionary initialized to empty lists.
         for variable in self.variables:
@@ -91,6 +111,18 @@ class ConstraintSatisfactionProblem(Generic[Variable, Domain]):
                 print("Constraint uses variable not within the CSP")
                 sys.exit(1)
 
+    # Builds the neighbors of every variable from its constraints
+    # Called by solve(), after all the constraints have been added
+    def finalize(self) -> None:
+        for variable in self.variables:
+            # The union of the neighbors in every constraint of this variable, so each neighbor is only counted once
+            self.neighbors_of[variable] = frozenset().union(
+                *(constraint.get_neighbors(variable) for constraint in self.constraints[variable]))
+            # The constraints of this variable that each neighbor is also a part of
+            for neighbor in self.neighbors_of[variable]:
+                self.shared_constraints[(variable, neighbor)] = [
+                    constraint for constraint in self.constraints[variable] if neighbor in constraint.get_neighbors(variable)]
+
     # Checks if a variable is consistent with ALL of its constraints
     # returns True if the assignment is consistent with this variable's constraints, False if inconsistent
     def consistent(self, variable: Variable, assignment: Dict[Variable, Domain]) -> bool:
@@ -104,205 +136,239 @@ class ConstraintSatisfactionProblem(Generic[Variable, Domain]):
         # Returns True when all constraints are satisfied
         return True
 
-    # Solves this CSP by starting the recursive call
+    # Removes the values from the domain of the variable (in-place)
+    # A copy of the old domain is pushed onto the trail first so that undo() can restore it
+    # Any container with copy() and remove() works as a domain, such as a list, a bytearray, or a set
+    def prune(self, domains: Dict[Variable, Collection[Domain]], variable: Variable, values: List[Domain]) -> None:
+        self.trail.append((variable, domains[variable].copy()))
+        for value in values:
+            domains[variable].remove(value)
+
+    # Restores every domain that was changed since the trail was mark entries long
+    def undo(self, domains: Dict[Variable, Collection[Domain]], mark: int) -> None:
+        while len(self.trail) > mark:
+            variable, domain = self.trail.pop()
+            domains[variable] = domain
+
+    # Solves this CSP by starting the backtracking search
     def solve(self) -> Optional[Dict[Variable, Domain]]:
+        self.finalize()
+
+        # The search assigns variables in-place, so work on a copy of the initial assignments
+        assignments = self.initial_assignments.copy()
 
         if self.forward:
             # Do a preliminary forward for all initial assignments
             for variable in self.initial_assignments:
-                self.forward_check(variable, self.initial_assignments, self.initial_domains)
+                self.forward_check(variable, assignments, self.initial_domains)
 
         if self.ac3:
             # Do a preliminary ac3 for all initial assignments
             for variable in self.initial_assignments:
-                self.ac3_check(variable, self.initial_assignments, self.initial_domains)
+                self.ac3_check(variable, assignments, self.initial_domains)
 
-        print("Initial Domains: " + str(self.initial_domains))
+        # The preliminary changes are never undone
+        self.trail = []
+
+        # Count the degree of every variable once, from then on it is updated as variables are assigned
+        for variable in self.variables:
+            self.degree_cache[variable] = self.count_degree(assignments, variable)
+
+        if self.verbose >= 1:
+            print("Initial Domains: " + str(self.initial_domains))
         # Return the final assignments
-        result = self.backtracking_search(self.initial_domains, self.initial_assignments)
+        result = self.backtracking_search(self.initial_domains, assignments)
 
-        success = True
+        success = result is not None
         # Double check that all variables' constraints are satisfied
         for variable in self.variables:
-            if not self.consistent(variable, result):
+            if success and not self.consistent(variable, result):
                 success = False
 
         print("Success: " + str(success))
+        if self.sudoku and self.verbose >= 2 and result is not None:
+            print_sudoku(result)
         return result
 
     # A helper function to count the degree of a variable given some assignments
-    # The degree is the number of constraints on REMAINING values
+    # The degree is the number of neighbors (variables sharing a constraint) that are REMAINING values
     def count_degree(self, assignments: Dict[Variable, Domain], variable: Variable):
         degree = 0
-        # For every constraint of this variable
-        for constraint in self.constraints[variable]:
-
-            # For every neighbor in the constraint
-            for neighbor in constraint.get_neighbors(variable):
-
-                # If the neighbor is not yet assigned, add to the degree
-                if self.degree_remaining:
-                    if neighbor not in assignments:
-                        degree += 1
-                # If the neighbor is already assigned, add to the degree
-                else:
-                    if neighbor in assignments:
-                        degree += 1
+        # For every neighbor of this variable
+        for neighbor in self.neighbors_of[variable]:
+
+            # If the neighbor is not yet assigned, add to the degree
+            if self.degree_remaining:
+                if neighbor not in assignments:
+                    degree += 1
+            # If the neighbor is already assigned, add to the degree
+            else:
+                if neighbor in assignments:
+                    degree += 1
         return degree
 
-    # Returns a list of all UNASSIGNED neighboring variables from the specified variable
-    def get_unassigned_neighbors(self, assignments: Dict[Variable, Domain], variable: Variable):
-        unassigned_neighbors = []
-        # For every constraint in the variable's list of constraints
-        for constraint in self.constraints[variable]:
-            # Get a list of every neighbor for that constraint
-            neighbors = constraint.get_neighbors(variable)
-            # Add every neighbor to the list of neighbors if they aren't already there
-            for neighbor in neighbors:
-                if neighbor not in assignments and neighbor not in unassigned_neighbors:
-                    unassigned_neighbors.append(neighbor)
-        # Return all unassigned neighbors
-        return unassigned_neighbors
-
-    # The backtracking recursive call
-    # the domains and the assignments up to this point of recursion are parameters
-    def backtracking_search(self, domains: Dict[Variable, List[Domain]],
-                            assignments: Dict[Variable, Domain]) -> Optional[Dict[Variable, Domain]]:
-        if self.sudoku:
-            print_sudoku(assignments)
-
-        # If the assignments are all done, the base case is reached and we return the assignments
-        if len(assignments) == len(self.variables):
-            print("Everything is Assigned")
-            return assignments
-
-        # Chooses the next variable based on which heuristics are enabled
-        cur_variable: Variable = None
+    # Updates the cached degree of every neighbor of a variable that was just assigned (or unassigned)
+    def update_degrees(self, variable: Variable, assigned: bool) -> None:
+        # An assignment adds to the degree of the neighbors when the degree counts assigned variables,
+        # and takes away from it when the degree counts remaining variables
+        delta = 1 if assigned != self.degree_remaining else -1
+        for neighbor in self.neighbors_of[variable]:
+            self.degree_cache[neighbor] += delta
+
+    # Returns a set of all UNASSIGNED neighboring variables from the specified variable
+    def get_unassigned_neighbors(self, assignments: Dict[Variable, Domain], variable: Variable) -> set:
+        # Every neighbor of the variable, minus the ones that are already assigned
+        return self.neighbors_of[variable] - assignments.keys()
+
+    # Chooses the next unassigned variable based on which heuristics are enabled
+    def select_variable(self, domains: Dict[Variable, Collection[Domain]], assignments: Dict[Variable, Domain]) -> Variable:
         if self.min_remain:
-            # For each unassigned variable
-            for v in self.variables:
-                if v not in assignments:
-                    # If it's the first loop, assign the variable regardless or its properties
-                    if cur_variable is None:
-                        cur_variable = v
-                    else:
-                        # Choose the variable with the least remaining values
-                        if len(domains[v]) < len(domains[cur_variable]):
-                            cur_variable = v
-                        elif self.degree:
-                            # If there is a tie
-                            if len(domains[v]) == len(domains[cur_variable]):
-                                # As a tie breaker, use the variable with the most constraints on remaining variables
-                                if self.count_degree(assignments, v) > self.count_degree(assignments, cur_variable):
-                                    cur_variable = v
-
-        else:
-            # Pick the variables in order. Pretty much random
-            for v in self.variables:
-                if v not in assignments:
-                    cur_variable = v
-                    break
-
-        # For every value in the domain of this variable
-        for value in domains[cur_variable]:
-
-            # Create a copy of the assignments so the original assignments are in tact when we backtrack
-            local_assignments = assignments.copy()
+            unassigned = [v for v in self.variables if v not in assignments]
+            if self.degree:
+                # Choose the variable with the least remaining values
+                # As a tie breaker, use the variable with the highest (cached) degree
+                return min(unassigned, key=lambda v: (len(domains[v]), -self.degree_cache[v]))
+            # Choose the variable with the least remaining values
+            return min(unassigned, key=lambda v: len(domains[v]))
+
+        # Pick the variables in order. Pretty much random
+        for v in self.variables:
+            if v not in assignments:
+                return v
+
+    # The backtracking search
+    # Instead of recursing, every level of the search is a frame on an explicit stack: [variable, values, trail_mark]
+    # where values is an iterator over the values of the variable that are left to try
+    # The domains and the assignments are edited in-place and restored from the trail when we backtrack
+    def backtracking_search(self, domains: Dict[Variable, Collection[Domain]],
+                            assignments: Dict[Variable, Domain]) -> Optional[Dict[Variable, Domain]]:
+        stack: List[list] = []
+
+        while True:
+            # If the assignments are all done, we return the assignments
+            if len(assignments) == len(self.variables):
+                if self.verbose >= 1:
+                    print("Everything is Assigned")
+                return assignments
+
+            # Go one level deeper with the next variable
+            cur_variable = self.select_variable(domains, assignments)
+            # The values are snapshotted into a tuple, so the iterator never sees the domain change
+            if self.value_rank is None:
+                values = tuple(domains[cur_variable])
+            else:
+                values = tuple(sorted(domains[cur_variable], key=self.value_rank.__getitem__))
+            stack.append([cur_variable, iter(values), len(self.trail)])
 
-            # Try adding this value to this variable into the assignments
-            local_assignments[cur_variable] = value
+            # Find the next value that is worth going deeper with, backtracking up the stack when a level runs out of values
+            found = False
+            while stack and not found:
+                frame = stack[-1]
+                variable = frame[0]
 
-            if self.loop_check:
-                # If this assignment if not already been tried (not within the list of previous assignments)
-                if local_assignments not in self.assignments_list:
-                    # Add it to the list of previous assignments
-                    self.assignments_list.append(local_assignments)
+                # If this level already has a value assigned, nothing below it worked
+                # Restore the domains and degrees before trying the next value
+                if variable in assignments:
+                    self.undo(domains, frame[2])
+                    self.update_degrees(variable, False)
+                    del assignments[variable]
 
-                else:
-                    # This assignment has already been tried before, so there must be a loop
-                    print("LOOPED: " + str(local_assignments))
-                    sys.exit()
+                # For every value left in the domain of this variable
+                for value in frame[1]:
 
-            # If this value is consistent with the variable's constraints
-            if self.consistent(cur_variable, local_assignments):
+                    # Try adding this value to this variable into the assignments
+                    assignments[variable] = value
 
-                # Make a copy of the domains so the original domains are in tact when we backtrack
-                local_domains = domains.copy()
+                    # If this value is consistent with the variable's constraints
+                    if self.consistent(variable, assignments):
 
-                # Manually deepcopy the lists inside the domain dictionary because copy.deepcopy() is SUPER slow
-                for key, domain_list in local_domains.items():
-                    local_domains[key] = domain_list.copy()
+                        # Remember where the trail is so every domain change below this point can be undone
+                        frame[2] = len(self.trail)
+                        self.update_degrees(variable, True)
 
-                if self.forward:
-                    # Remove the conflicting values from the domains for variables that share constraints with this one
-                    self.forward_check(cur_variable, local_assignments, local_domains)
+                        # Remove the conflicting values from the domains for variables that share constraints with this one
+                        # If forward checking leaves a variable without any values, try the next value
+                        forward_ok = not self.forward or self.forward_check(variable, assignments, domains)
 
-                if self.ac3:
-                    # Propagate constraints and eliminate all possible conflicts that this new variable assignment causes
-                    # If this new assignment causes ac3 to determine that no solution can be made from here, immediately backtrack
-                    if not self.ac3_check(cur_variable, local_assignments, local_domains):
-                        return None
+                        # Propagate constraints and eliminate all possible conflicts that this new variable assignment causes
+                        # If this new assignment causes ac3 to determine that no solution can be made from here, try the next value
+                        if forward_ok and (not self.ac3 or self.ac3_check(variable, assignments, domains)):
+                            found = True
+                            break
 
-                # Recurse with the new assignments and updated domains
-                result: Optional[Dict[Variable, Domain]] = self.backtracking_search(local_domains, local_assignments)
+                        # Restore the domains and degrees before trying the next value
+                        self.undo(domains, frame[2])
+                        self.update_degrees(variable, False)
 
-                # If we found the result, propagate the value back to the original call
-                if result is not None:
-                    return result
+                    del assignments[variable]
 
-        if self.sudoku:
-            print_sudoku(assignments)
+                else:
+                    # No value of this variable works with the assignments above it, so go back up a level
+                    stack.pop()
 
-        # If no solutions can be found with the assignments given to us, let the caller know that this variable has no assignments that work
-        return None
+            # If every level ran out of values, there is no solution
+            if not found:
+                return None
 
     # Function that removes the domains from all variables that would break a constraint given this new assignment
     # parameters: the newly assigned variable, its new assignment, and the domains of all variables
     # Edits the domains parameter in-place
-    def forward_check(self, variable: Variable, assignments: Dict[Variable, Domain], domains: Dict[Variable, List[Domain]]):
+    # Returns False as soon as a neighbor is left with an empty domain, since no solution can be made from here
+    def forward_check(self, variable: Variable, assignments: Dict[Variable, Domain], domains: Dict[Variable, Collection[Domain]]) -> bool:
 
         # For every unassigned neighbor to this variable
         for neighbor in self.get_unassigned_neighbors(assignments, variable):
             domains_to_delete: List[Domain] = []
 
-            # Make a copy of the current assignments (assignments should be read-only)
-            possible_assignments = assignments.copy()
-
             # For every remaining value in the domain of this neighbor
             for possible_domain in domains[neighbor]:
 
                 # Make a hypothetical assignment using this value
-                possible_assignments[neighbor] = possible_domain
+                assignments[neighbor] = possible_domain
 
                 # If the addition of this assignment breaks a constraint
-                if not self.consistent(neighbor, possible_assignments):
+                if not self.consistent(neighbor, assignments):
 
                     # Mark it for removal
                     domains_to_delete.append(possible_domain)
 
+            # Take back the hypothetical assignment
+            assignments.pop(neighbor, None)
+
             # Remove all values in this neighbor's domain that are not consistent (in-place)
-            for domain in domains_to_delete:
-                domains[neighbor].remove(domain)
+            if domains_to_delete:
+                self.prune(domains, neighbor, domains_to_delete)
+
+                # If the domain is empty, we detected a failure > return False
+                if len(domains[neighbor]) == 0:
+                    return False
+
+        return True
 
     # Propagate constraint satisfaction based on a newly assigned variable
     # Returns False if we detect a failure early
     # Edits the domain in-place
-    def ac3_check(self, starting_variable: Variable, assignments: Dict[Variable, Domain], domains: Dict[Variable, List[Domain]]) -> bool:
-        # Queue that contains a list of two values: [variable_to_check, against_variable]
-        #                                                      -------->--------
+    def ac3_check(self, starting_variable: Variable, assignments: Dict[Variable, Domain], domains: Dict[Variable, Collection[Domain]]) -> bool:
+        # Queue that contains arcs of two values: (variable_to_check, against_variable)
+        #                                                    -------->--------
         queue = deque()
+        # The set of arcs currently in the queue, so that the same arc is never queued twice
+        in_queue = set()
 
         # Initially add arcs to the queue
         # where each neighbor of the newly changed variable is checked against the newly changed variable
         # Neighbor ----->----- starting_variable
         neighbors = self.get_unassigned_neighbors(assignments, starting_variable)
         for neighbor in neighbors:
-            queue.append([neighbor, starting_variable])
+            arc = (neighbor, starting_variable)
+            queue.append(arc)
+            in_queue.add(arc)
 
         # While there are still arcs to check
         while len(queue) > 0:
             # Take an arc off the end of the queue
             arc = queue.popleft()
+            in_queue.remove(arc)
 
             # If there is an inconsistency detected and the domain for arc[0] is updated
             if self.remove_inconsistent(assignments, domains, variable_to_check=arc[0], against_variable=arc[1]):
@@ -316,40 +382,50 @@ class ConstraintSatisfactionProblem(Generic[Variable, Domain]):
                 # Neighbor ----->----- Updated Variable
                 neighbors = self.get_unassigned_neighbors(assignments, arc[0])
                 for neighbor in neighbors:
-                    if neighbor != arc[1]:
-                        queue.append((neighbor, starting_variable))
+                    new_arc = (neighbor, arc[0])
+                    if neighbor != arc[1] and new_arc not in in_queue:
+                        queue.append(new_arc)
+                        in_queue.add(new_arc)
         # If we reach this point, that means potentially updated domains and no failure was detected
         return True
 
     # We are checking the arc consistency between variable_to_check ----->----- against_variable
     # A value in check_variable is consistent if there exists at least one value in against_variable that satisfies all constraints
-    def remove_inconsistent(self, assignments: Dict[Variable, Domain], domains: Dict[Variable, List[Domain]],
-                            variable_to_check: Variable, against_variable: Variable):
-        domain_modified = False
+    # Edits the domain of variable_to_check in-place
+    # Double support checks (AC-3b) were tried here and left out: the bookkeeping cost more than the checks they saved
+    def remove_inconsistent(self, assignments: Dict[Variable, Domain], domains: Dict[Variable, Collection[Domain]],
+                            variable_to_check: Variable, against_variable: Variable) -> bool:
+        values_to_remove: List[Domain] = []
+
+        # If against_variable is already assigned, its assigned value is the only one to test against
+        against_assigned = against_variable in assignments
+        if against_assigned:
+            against_values = [assignments[against_variable]]
+        else:
+            against_values = domains[against_variable]
+
+        # Only the constraints that variable_to_check shares with against_variable can be broken by against_value
+        shared_constraints = self.shared_constraints[(variable_to_check, against_variable)]
 
         # For every value in the domain of variable_to_check (we could potentially remove every value in the domain)
         for value_to_check in domains[variable_to_check]:
 
-            # Create a copy of the assignments
-            local_assignments = assignments.copy()
-
             # Make a hypothetical assignment with the value to check
-            local_assignments[variable_to_check] = value_to_check
+            assignments[variable_to_check] = value_to_check
 
-            has_consistent = True
+            has_consistent = False
             # Test it against every value in the domain of against_variable
-            for against_value in domains[against_variable]:
+            for against_value in against_values:
 
                 # Make a hypothetical assignment with the value we want to test against
-                local_assignments[against_variable] = against_value
+                assignments[against_variable] = against_value
 
                 inconsistency_found = False
-                # Test if variable_to_check's constraints are satisfied given these two hypothetical assignments
-                # Loop through variable_to_check's constraints
-                for constraint in self.constraints[variable_to_check]:
+                # Test if the shared constraints are satisfied given these two hypothetical assignments
+                for constraint in shared_constraints:
 
-                    # If against_value shares this constraint and it's not satisfied with the against_value
-                    if against_variable in constraint.get_neighbors(variable_to_check) and not constraint.is_satisfied(local_assignments):
+                    # If this constraint is not satisfied with the against_value
+                    if not constraint.is_satisfied(assignments):
 
                         # There is an inconsistency with the current constraint, so this particular assignment of
                         # against_variable is inconsistent
@@ -365,8 +441,15 @@ class ConstraintSatisfactionProblem(Generic[Variable, Domain]):
             # If there is no value in the domain of against_variable that satisfies the constraints for the value we
             # are checking, then we can remove the value we are checking from the domain of variable_to_check
             if not has_consistent:
-                domains[value_to_check].remove(value_to_check)
-                domain_modified = True
-
-        # If we made any modifications to the domain of the variable we checked, then return True
-        return domain_modified
+                values_to_remove.append(value_to_check)
+
+        # Take back the hypothetical assignments
+        assignments.pop(variable_to_check, None)
+        if not against_assigned:
+            assignments.pop(against_variable, None)
+
+        # If we need to make any modifications to the domain of the variable we checked, then return True
+        if values_to_remove:
+            self.prune(domains, variable_to_check, values_to_remove)
+            return True
+        return False
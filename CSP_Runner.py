@@ -1,17 +1,18 @@
 from CSP import Constraint, ConstraintSatisfactionProblem, print_sudoku
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+import SudokuSolver
 import time
 import json
 
 
 # A map constraint is a two way constraint between two variables
-class MapConstraint(Constraint[str, str]):
-    def __init__(self, place1: str, place2: str) -> None:
+class MapConstraint(Constraint[int, str]):
+    def __init__(self, place1: int, place2: int) -> None:
         super().__init__([place1, place2])
-        self.place1: str = place1
-        self.place2: str = place2
+        self.place1: int = place1
+        self.place2: int = place2
 
-    def is_satisfied(self, assignment: Dict[str, str]) -> bool:
+    def is_satisfied(self, assignment: Dict[int, str]) -> bool:
         # If either place is not in the assignment then it is not
         # yet possible for their colors to be conflicting
         if self.place1 not in assignment or self.place2 not in assignment:
@@ -22,85 +23,88 @@ class MapConstraint(Constraint[str, str]):
 
 
 # A sudoku constraint is shared between 9 variables. It is not directional, so all 9 variables actually share this
-class SudokuConstraint(Constraint[str, int]):
-    def __init__(self, places: List[str]):
+class SudokuConstraint(Constraint[int, int]):
+    def __init__(self, places: List[int]):
         super().__init__(places)
 
-    def is_satisfied(self, assignment: Dict[str, int]) -> bool:
-        # For each assigned variable
-        for index in range(len(self.variables)):
-            variable = self.variables[index]
+    def is_satisfied(self, assignment: Dict[int, int]) -> bool:
+        # A bitmask of the values seen so far, where bit k is set if the value k is assigned
+        seen = 0
+        # For each assigned variable in the row/cell
+        for variable in self.variables:
             if variable in assignment:
-                # Every other variable in the row/cell
-                # We only check the values forward from the current index since previous
-                # indices have already been checked for equality
-                for i in range(index + 1, len(self.variables)):
-                    variable_2 = self.variables[i]
-                    if variable_2 in assignment:
-                        # If the domain of the variables are the same
-                        if assignment[variable] == assignment[variable_2]:
-                            # Constraint is not satisfied
-                            return False
+                bit = 1 << assignment[variable]
+                # If the value has already been seen, the constraint is not satisfied
+                if seen & bit:
+                    return False
+                seen |= bit
         return True
 
 
 # A method used to parse the json, specify the domains and add the constraints
-def createMapCSP() -> ConstraintSatisfactionProblem:
-    csp: ConstraintSatisfactionProblem[str, str] = None
+# Returns (csp, labels): the map CSP, and the list of labels where labels[variable] is the label of that variable
+# Each point's label is mapped to an int variable (its index in the json), so the CSP never hashes strings
+def createMapCSP(verbose: int = 0) -> Tuple[ConstraintSatisfactionProblem, List[str]]:
+    csp: ConstraintSatisfactionProblem[int, str] = None
     with open('gcp.json', 'r') as f:
         data = json.load(f)
-        print(data)
-        variables: List[str] = []
-        domains: Dict[str, List[str]] = {}
-        for key in data['points']:
-            variables.append(key)
-            domains[key] = ["red", "green", "blue", "purple"]
-        csp = ConstraintSatisfactionProblem(variables, domains)
+        if verbose >= 1:
+            print(data)
+        labels: List[str] = list(data['points'])
+        index_of: Dict[str, int] = {label: index for index, label in enumerate(labels)}
+        variables: List[int] = list(range(len(labels)))
+        # Each domain is a set, so removing a color from it is O(1)
+        # The colors are always tried in this order, since a set of strings iterates in a different order every run
+        colors = ["red", "green", "blue", "purple"]
+        domains: Dict[int, set] = {variable: set(colors) for variable in variables}
+        csp = ConstraintSatisfactionProblem(variables, domains, verbose=verbose, value_order=colors)
         for edge in data['edges']:
-            csp.add_constraint(MapConstraint(str(edge[0]), str(edge[1])))
-    return csp
+            csp.add_constraint(MapConstraint(index_of[str(edge[0])], index_of[str(edge[1])]))
+    return csp, labels
 
 
 # A method to parse the json, specify the domains, specify the initial assignment and add the constraints
 # There is not 2d array or anything like that that makes up the sudoku board
 # The board's structure is dictated simply by the constraints and saved in a list of variables
-# with variable values in the format '##' where the first number is the column and the second is the row
-def createSudokuCSP() -> ConstraintSatisfactionProblem:
+# where each variable is the int col * 9 + row (the same cell ids SudokuSolver uses)
+def createSudokuCSP(verbose: int = 0) -> ConstraintSatisfactionProblem:
     csp: ConstraintSatisfactionProblem = None
     with open('sudoku.json', 'r') as f:
         table = json.load(f)
         variables = []
-        domains: Dict[str, List[int]] = {}
-        assignments: Dict[str, int] = {}
+        # Each domain is a set, so removing a value from it is O(1)
+        # A set of small ints iterates in ascending order, so unlike the map CSP no value_order is needed
+        domains: Dict[int, set] = {}
+        assignments: Dict[int, int] = {}
         # For each column
         for col in range(0, 9):
             # For each row
             for row in range(0, 9):
-                # The key is '##' where 1 <= # <= 9 and it's '[col][row]'
-                key = str(col + 1) + str(row + 1)
+                # The key is col * 9 + row where 0 <= col, row <= 8
+                key = SudokuSolver.cell_id(col, row)
                 # Add this key to the list of all variables
                 variables.append(key)
                 # The domain of a pre-assigned space is that one value (not necessary, but just for consistency)
                 # The domain of a non-assigned space is 1-9
                 if table[col][row] != 0:
-                    domains[key] = [table[col][row]]
+                    domains[key] = {table[col][row]}
                     assignments[key] = table[col][row]
                 else:
-                    domains[key] = list(range(1, 10))
+                    domains[key] = set(range(1, 10))
 
-        csp = ConstraintSatisfactionProblem(variables, domains, initial_assignments=assignments, sudoku= True)
+        csp = ConstraintSatisfactionProblem(variables, domains, initial_assignments=assignments, sudoku=True, verbose=verbose)
         # Horizontal Constraints
         for col in range(len(table)):
-            row_list: List[str] = []
+            row_list: List[int] = []
             for row in range(len(table)):
-                row_list.append(str(col + 1) + str(row + 1))
+                row_list.append(SudokuSolver.cell_id(col, row))
             csp.add_constraint(SudokuConstraint(row_list))
 
         # Vertical Constraints
         for row in range(len(table)):
             col_list = []
             for col in range(len(table)):
-                col_list.append(str(col + 1) + str(row + 1))
+                col_list.append(SudokuSolver.cell_id(col, row))
             csp.add_constraint(SudokuConstraint(col_list))
 
         # Cell Constraints
@@ -109,17 +113,45 @@ def createSudokuCSP() -> ConstraintSatisfactionProblem:
                 cell_list = []
                 for row in range(0, 3):
                     for col in range(0, 3):
-                        cell_list.append(str(3 * cell_row + row + 1) + str(3 * cell_col + col + 1))
+                        cell_list.append(SudokuSolver.cell_id(3 * cell_row + row, 3 * cell_col + col))
                 csp.add_constraint(SudokuConstraint(cell_list))
     return csp
 
 
+# A method to parse the json into the 9x9 table used by SudokuSolver, where 0 is an empty space
+def createSudokuTable() -> List[List[int]]:
+    with open('sudoku.json', 'r') as f:
+        return json.load(f)
+
+
+# Double checks a sudoku solution against the same constraints as the general CSP
+# Returns True if every space is assigned and all 27 horizontal, vertical, and cell constraints are satisfied
+def checkSudokuSolution(solution: Dict[int, int]) -> bool:
+    if len(solution) != 81 or 0 in solution.values():
+        return False
+    return all(SudokuConstraint(list(unit)).is_satisfied(solution) for unit in SudokuSolver.UNITS)
+
+
 if __name__ == "__main__":
+    # Solve the sudoku with the bitmask solver instead of the general CSP
+    bitmask = True
     variables: List[str] = []
-    csp = createSudokuCSP()
-    start = time.time()
-    solution: Optional[Dict[str, int]] = csp.solve()
-    print("Time: " + str(time.time() - start))
+    if bitmask:
+        table = createSudokuTable()
+        start = time.time()
+        result = SudokuSolver.solve_sudoku_fast(table)
+        # The board is indexed by the same cell ids as the general CSP's variables
+        solution: Optional[Dict[int, int]] = None
+        if result is not None:
+            solution = dict(enumerate(result))
+        print("Time: " + str(time.time() - start))
+        # The general CSP double checks its own result in solve(), the bitmask solver does not
+        print("Success: " + str(solution is not None and checkSudokuSolution(solution)))
+    else:
+        csp = createSudokuCSP(verbose=0)
+        start = time.time()
+        solution: Optional[Dict[int, int]] = csp.solve()
+        print("Time: " + str(time.time() - start))
     if solution is None:
         print("No solution found!")
     else:
@@ -127,12 +159,13 @@ if __name__ == "__main__":
         print("Solution Found")
         print(solution)
 
-    csp = createMapCSP()
+    csp, labels = createMapCSP(verbose=0)
     start = time.time()
-    solution: Optional[Dict[str, str]] = csp.solve()
+    solution: Optional[Dict[int, str]] = csp.solve()
     print("Time: " + str(time.time() - start))
     if solution is None:
         print("No solution found!")
     else:
         print("Solution Found")
-        print(solution)
+        # Print the solution with the original labels
+        print({labels[variable]: color for variable, color in solution.items()})
@@ -0,0 +1,227 @@
+from array import array
+from typing import List, Optional, Tuple
+
+# A sudoku-specific solver that stores every domain as a bitmask instead of a list of values
+# Cells are identified by an int id (col * 9 + row) from cell_id, the same keys CSP_Runner uses for the general sudoku CSP
+# The assignments are a flat board of 81 bytes indexed by cell id, where 0 is an unassigned cell
+# Bit k of a domain is set when the value k is still possible, so a full domain of 1-9 is 0b1111111110
+ALL_VALUES = 0x3FE
+# POPCNT[domain] is the number of values remaining in a domain
+POPCNT = bytes(bin(i).count('1') for i in range(1024))
+
+
+# Converts a column and row (0-8) into the id of that cell
+def cell_id(col: int, row: int) -> int:
+    return col * 9 + row
+
+
+# Builds the tables describing the structure of the board
+# units: the 27 groups of 9 cells that must all be different (horizontal, vertical, and cell constraints)
+# cell_units: for every cell, the indices of the 3 units it is a part of, in the order (horizontal, vertical, cell)
+# peers: for every cell, the 20 other cells that share at least one unit with it
+def build_tables() -> Tuple[List[Tuple[int, ...]], List[Tuple[int, ...]], List[Tuple[int, ...]]]:
+    units: List[Tuple[int, ...]] = []
+    # Horizontal units
+    for col in range(9):
+        units.append(tuple(cell_id(col, row) for row in range(9)))
+    # Vertical units
+    for row in range(9):
+        units.append(tuple(cell_id(col, row) for col in range(9)))
+    # Cell units
+    for cell_row in range(3):
+        for cell_col in range(3):
+            units.append(tuple(cell_id(3 * cell_row + row, 3 * cell_col + col) for row in range(3) for col in range(3)))
+
+    cell_units: List[List[int]] = [[] for _ in range(81)]
+    for index, unit in enumerate(units):
+        for cell in unit:
+            cell_units[cell].append(index)
+
+    peers: List[Tuple[int, ...]] = []
+    for cell in range(81):
+        cell_peers = set()
+        for index in cell_units[cell]:
+            cell_peers.update(units[index])
+        cell_peers.discard(cell)
+        peers.append(tuple(sorted(cell_peers)))
+
+    return units, [tuple(indices) for indices in cell_units], peers
+
+
+# The structure of the board never changes, so the tables are built once when this module is imported
+UNITS, CELL_UNITS, PEERS = build_tables()
+
+
+# Creates the bitmask domains and the initial board from a 9x9 table where 0 is an empty space
+def create_domains(table: List[List[int]]) -> Tuple[array, array]:
+    domains = array('H', [ALL_VALUES] * 81)
+    board = array('b', [0] * 81)
+    for col in range(9):
+        for row in range(9):
+            if table[col][row] != 0:
+                domains[cell_id(col, row)] = 1 << table[col][row]
+                board[cell_id(col, row)] = table[col][row]
+    return domains, board
+
+
+# Solves the board given its domains and initial assignments
+# Returns the completed board, or None if there is no solution
+def solve(domains: array, board: array) -> Optional[array]:
+    board = array('b', board)
+
+    # unit_masks[u] has bit k set when the value k is already assigned somewhere in unit u
+    # The first 9 masks are the horizontal units, the next 9 the vertical units, and the last 9 the cell units
+    unit_masks = array('H', [0] * len(UNITS))
+    for cell in range(81):
+        if board[cell] == 0:
+            continue
+        # Two of the initial assignments already conflict
+        if not consistent(cell, board[cell], unit_masks, CELL_UNITS):
+            return None
+        for index in CELL_UNITS[cell]:
+            unit_masks[index] |= 1 << board[cell]
+
+    # Do a preliminary forward check for all initial assignments
+    # These removals are never undone, so their undo log is thrown away
+    domains = array('H', domains)
+    for cell in range(81):
+        if board[cell] != 0 and not forward_check(cell, board[cell], domains, board, PEERS, []):
+            return None
+
+    return backtracking_search(domains, board, unit_masks, CELL_UNITS, PEERS)
+
+
+# Checks if assigning the value to the cell is consistent with the values already assigned in its 3 units
+# The values used by the cell's horizontal, vertical, and cell units are OR'd together and tested with a single AND
+def consistent(cell: int, value: int, unit_masks: array, cell_units: List[Tuple[int, ...]]) -> bool:
+    horizontal, vertical, box = cell_units[cell]
+    return not (unit_masks[horizontal] | unit_masks[vertical] | unit_masks[box]) & (1 << value)
+
+
+# Removes the value from the domains of every unassigned peer of the cell (in-place)
+# Every removal is pushed onto the undo stack as (cell, removed_bits) so it can be restored when we backtrack
+# Returns False if a peer is left without any possible values
+def forward_check(cell: int, value: int, domains: array, board: array,
+                  peers: List[Tuple[int, ...]], undo_stack: List[Tuple[int, int]]) -> bool:
+    bit = 1 << value
+    for peer in peers[cell]:
+        if board[peer] == 0 and domains[peer] & bit:
+            domains[peer] ^= bit
+            undo_stack.append((peer, bit))
+            if domains[peer] == 0:
+                return False
+    return True
+
+
+# The backtracking search, with forward checking and naked singles propagation after every assignment
+# The next cell is the one with the minimum remaining values (lowest cell id on a tie, there is no degree tie-break),
+# and its values are tried from lowest to highest
+# Instead of recursing, every level of the search is a frame on an explicit stack: [cell, tried_mask, undo_mark]
+# where tried_mask has a bit set for every value already tried for the cell
+# Domains are edited in-place and restored from the undo stack, so no state is copied between levels
+# The tables are passed in as locals, and consistent, forward_check and the minimum remaining values heuristic are inlined
+# into the loop, removing several Python function calls per search node
+def backtracking_search(domains: array, board: array, unit_masks: array,
+                        cell_units: List[Tuple[int, ...]], peers: List[Tuple[int, ...]]) -> Optional[array]:
+    popcnt = POPCNT
+    undo_stack: List[Tuple[int, int]] = []
+    stack: List[List[int]] = []
+
+    while True:
+        # Choose the unassigned cell with the minimum remaining values
+        next_cell = -1
+        next_count = 10
+        for candidate in range(81):
+            if board[candidate] == 0 and popcnt[domains[candidate]] < next_count:
+                next_cell = candidate
+                next_count = popcnt[domains[candidate]]
+                if next_count <= 1:
+                    break
+
+        # If the assignments are all done, we found the result
+        if next_cell == -1:
+            return board
+
+        # Go one level deeper with the chosen cell
+        stack.append([next_cell, 0, 0])
+
+        # Find the next value that is worth going deeper with, backtracking up the stack when a level runs out of values
+        found = False
+        while stack and not found:
+            frame = stack[-1]
+            cell = frame[0]
+            horizontal, vertical, box = cell_units[cell]
+
+            # Undo the last value tried for this cell
+            if board[cell] != 0:
+                bit = 1 << board[cell]
+                board[cell] = 0
+                unit_masks[horizontal] ^= bit
+                unit_masks[vertical] ^= bit
+                unit_masks[box] ^= bit
+                mark = frame[2]
+                while len(undo_stack) > mark:
+                    peer, bits = undo_stack.pop()
+                    if bits == 0:
+                        # Unassign a cell that was assigned as a naked single
+                        bits = 1 << board[peer]
+                        board[peer] = 0
+                        for index in cell_units[peer]:
+                            unit_masks[index] ^= bits
+                    else:
+                        domains[peer] |= bits
+
+            # If every value in the domain has been tried, backtrack to the previous frame
+            remaining = domains[cell] & ~frame[1]
+            if remaining == 0:
+                stack.pop()
+                continue
+
+            # Try the lowest remaining value, if it is consistent with the values already assigned in its 3 units
+            bit = remaining & -remaining
+            frame[1] |= bit
+            if (unit_masks[horizontal] | unit_masks[vertical] | unit_masks[box]) & bit:
+                continue
+            board[cell] = bit.bit_length() - 1
+            unit_masks[horizontal] |= bit
+            unit_masks[vertical] |= bit
+            unit_masks[box] |= bit
+            frame[2] = len(undo_stack)
+
+            # Forward check the new assignment, then assign every peer left with a single possible value (a naked single)
+            # and forward check it in turn
+            # A naked single is pushed onto the undo stack as (cell, 0) so it can be unassigned when we backtrack
+            found = True
+            worklist = [cell]
+            while worklist and found:
+                assigned = worklist.pop()
+                assigned_bit = 1 << board[assigned]
+                for peer in peers[assigned]:
+                    if board[peer] == 0 and domains[peer] & assigned_bit:
+                        domain = domains[peer] ^ assigned_bit
+                        domains[peer] = domain
+                        undo_stack.append((peer, assigned_bit))
+                        if domain == 0:
+                            found = False
+                            break
+                        if popcnt[domain] == 1:
+                            single_horizontal, single_vertical, single_box = cell_units[peer]
+                            if (unit_masks[single_horizontal] | unit_masks[single_vertical] | unit_masks[single_box]) & domain:
+                                found = False
+                                break
+                            board[peer] = domain.bit_length() - 1
+                            unit_masks[single_horizontal] |= domain
+                            unit_masks[single_vertical] |= domain
+                            unit_masks[single_box] |= domain
+                            undo_stack.append((peer, 0))
+                            worklist.append(peer)
+
+        # Every value of the first cell failed, so there is no solution
+        if not found:
+            return None
+
+
+# Solves a standard 9x9 board taken straight from sudoku.json, where 0 is an empty space
+# Returns the completed board, or None if there is no solution
+def solve_sudoku_fast(table: List[List[int]]) -> Optional[array]:
+    return solve(*create_domains(table))